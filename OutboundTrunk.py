@@ -1,79 +1,138 @@
-import json
+import asyncio
 import logging
 import os
-import re
-import subprocess
+import aiohttp
 from dotenv import load_dotenv
+from livekit import api
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
+# Shared Twilio clients keyed by (account SID, auth token), created on first
+# use by get_twilio_client()
+_twilio_clients = {}
+
+# Number of trunks fetched per Twilio page
+TRUNK_PAGE_SIZE = 50
+
+# Concurrent trunk deletions; kept below the HTTP connection pool size
+DELETE_WORKERS = 10
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """Twilio HTTP client that keeps TLS connections alive between requests"""
+
+    def __init__(self, pool_size=4, pool_maxsize=20, max_retries=None, **kwargs):
+        super().__init__(pool_connections=True, max_retries=max_retries, **kwargs)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=max_retries if max_retries is not None else 0,
+        )
+        self.session.mount("https://", adapter)
+
+def get_twilio_client(account_sid, auth_token):
+    """Return the shared Twilio client for a set of credentials, creating it on first use"""
+    key = (account_sid, auth_token)
+    client = _twilio_clients.get(key)
+    if client is None:
+        client = Client(account_sid, auth_token, http_client=PooledTwilioHttpClient())
+        _twilio_clients[key] = client
+    return client
+
 def get_env_var(var_name):
     value = os.getenv(var_name)
     if value is None:
-        logging.error(f"Environment variable '{var_name}' not set.")
+        logging.error("Environment variable '%s' not set.", var_name)
         exit(1)
     return value
 
-def get_or_update_livekit_trunk(client, sip_uri):
+def find_livekit_trunk(client):
+    """Page through trunks and return the first LiveKit trunk, or None"""
+    for trunk in client.trunking.v1.trunks.stream(page_size=TRUNK_PAGE_SIZE):
+        if trunk.friendly_name == "LiveKit Trunk":
+            return trunk
+    return None
+
+async def get_or_update_livekit_trunk(client, sip_uri):
     """Get existing LiveKit trunk or create/update it"""
-    existing_trunks = client.trunking.v1.trunks.list()
-    
+    trunk = await asyncio.to_thread(find_livekit_trunk, client)
+
     # Check if LiveKit trunk already exists
-    for trunk in existing_trunks:
-        if trunk.friendly_name == "LiveKit Trunk":
-            logging.info(f"Found existing LiveKit Trunk: {trunk.sid}")
-            
-            # Check if origination URL exists
-            origination_urls = trunk.origination_urls.list()
-            existing_sip_url = None
-            
-            for url in origination_urls:
-                if "livekit" in url.friendly_name.lower() or url.sip_url == sip_uri:
-                    existing_sip_url = url
-                    break
-            
-            if existing_sip_url:
-                if existing_sip_url.sip_url != sip_uri:
-                    # Update existing origination URL
-                    existing_sip_url.update(sip_url=sip_uri)
-                    logging.info(f"Updated existing origination URL with new SIP URI: {sip_uri}")
-                else:
-                    logging.info("SIP URI already configured correctly")
+    if trunk is not None:
+        logging.info("Found existing LiveKit Trunk: %s", trunk.sid)
+        
+        # Check if origination URL exists
+        origination_urls = await asyncio.to_thread(trunk.origination_urls.list)
+        existing_sip_url = None
+        
+        for url in origination_urls:
+            if "livekit" in url.friendly_name.lower() or url.sip_url == sip_uri:
+                existing_sip_url = url
+                break
+        
+        if existing_sip_url:
+            if existing_sip_url.sip_url != sip_uri:
+                # Update existing origination URL
+                await asyncio.to_thread(existing_sip_url.update, sip_url=sip_uri)
+                logging.info("Updated existing origination URL with new SIP URI: %s", sip_uri)
             else:
-                # Add new origination URL
-                trunk.origination_urls.create(
-                    sip_url=sip_uri,
-                    weight=1,
-                    priority=1,
-                    enabled=True,
-                    friendly_name="LiveKit SIP URI",
-                )
-                logging.info(f"Added new origination URL: {sip_uri}")
-            
-            return trunk
+                logging.info("SIP URI already configured correctly")
+        else:
+            # Add new origination URL
+            await asyncio.to_thread(
+                trunk.origination_urls.create,
+                sip_url=sip_uri,
+                weight=1,
+                priority=1,
+                enabled=True,
+                friendly_name="LiveKit SIP URI",
+            )
+            logging.info("Added new origination URL: %s", sip_uri)
+        
+        return trunk
     
     # If no existing trunk found, we have a problem with trial accounts
     logging.error("No existing LiveKit trunk found, but trial accounts can only have one trunk.")
     logging.error("Please delete existing trunk manually from Twilio Console or upgrade to paid account.")
     exit(1)
 
-def delete_all_trunks_and_create_new(client, sip_uri):
+async def delete_trunk(client, trunk, semaphore):
+    async with semaphore:
+        logging.info("Deleting trunk: %s (%s)", trunk.sid, trunk.friendly_name)
+        await asyncio.to_thread(client.trunking.v1.trunks(trunk.sid).delete)
+
+async def delete_all_trunks_and_create_new(client, sip_uri):
     """Delete all existing trunks and create a new LiveKit trunk (use with caution)"""
-    existing_trunks = client.trunking.v1.trunks.list()
+    # Collect every page before deleting, since deletions shift later pages
+    existing_trunks = await asyncio.to_thread(
+        client.trunking.v1.trunks.list, page_size=TRUNK_PAGE_SIZE
+    )
     
-    # Delete all existing trunks
-    for trunk in existing_trunks:
-        logging.info(f"Deleting trunk: {trunk.sid} ({trunk.friendly_name})")
-        client.trunking.v1.trunks(trunk.sid).delete()
+    # Delete all existing trunks concurrently, bounded so the deletes never
+    # outnumber the pooled Twilio connections
+    semaphore = asyncio.Semaphore(DELETE_WORKERS)
+    results = await asyncio.gather(
+        *(delete_trunk(client, trunk, semaphore) for trunk in existing_trunks),
+        return_exceptions=True,
+    )
+    failed = [(trunk, result) for trunk, result in zip(existing_trunks, results) if isinstance(result, BaseException)]
+    for trunk, error in failed:
+        logging.error("Failed to delete trunk %s: %s", trunk.sid, error)
+    if failed:
+        exit(1)
     
     # Create new trunk
     domain_name = f"livekit-trunk-{os.urandom(4).hex()}.pstn.twilio.com"
-    trunk = client.trunking.v1.trunks.create(
+    trunk = await asyncio.to_thread(
+        client.trunking.v1.trunks.create,
         friendly_name="LiveKit Trunk",
         domain_name=domain_name,
     )
     
     # Add origination URL
-    trunk.origination_urls.create(
+    await asyncio.to_thread(
+        trunk.origination_urls.create,
         sip_url=sip_uri,
         weight=1,
         priority=1,
@@ -81,81 +140,47 @@ def delete_all_trunks_and_create_new(client, sip_uri):
         friendly_name="LiveKit SIP URI",
     )
     
-    logging.info(f"Created new LiveKit Trunk: {trunk.sid}")
+    logging.info("Created new LiveKit Trunk: %s", trunk.sid)
     return trunk
 
-def create_inbound_trunk(phone_number):
+async def create_inbound_trunk(livekit_api, phone_number):
     """Create inbound trunk using LiveKit API directly"""
-    try:
-        # Check if LiveKit CLI is available
-        result = subprocess.run(['lk', '--version'], capture_output=True, text=True)
-        if result.returncode != 0:
-            raise FileNotFoundError("LiveKit CLI not found")
-        
-        # Use CLI if available
-        trunk_data = {
-            "trunk": {
-                "name": "Inbound LiveKit Trunk",
-                "numbers": [phone_number]
-            }
-        }
-        with open('inbound_trunk.json', 'w') as f:
-            json.dump(trunk_data, f, indent=4)
-
-        result = subprocess.run(
-            ['lk', 'sip', 'inbound', 'create', 'inbound_trunk.json'],
-            capture_output=True,
-            text=True
+    request = api.CreateSIPInboundTrunkRequest(
+        trunk=api.SIPInboundTrunkInfo(
+            name="Inbound LiveKit Trunk",
+            numbers=[phone_number],
         )
+    )
 
-        if result.returncode != 0:
-            logging.error(f"Error executing command: {result.stderr}")
-            return None
-
-        match = re.search(r'ST_\w+', result.stdout)
-        if match:
-            inbound_trunk_sid = match.group(0)
-            logging.info(f"Created inbound trunk with SID: {inbound_trunk_sid}")
-            return inbound_trunk_sid
-        else:
-            logging.error("Could not find inbound trunk SID in output.")
-            return None
-            
-    except FileNotFoundError:
-        logging.warning("LiveKit CLI not found. Please install it or use LiveKit Cloud dashboard.")
-        logging.info("To install LiveKit CLI:")
-        logging.info("1. Via Chocolatey: choco install livekit-cli")
-        logging.info("2. Via Scoop: scoop install livekit-cli")
-        logging.info("3. Download from: https://github.com/livekit/livekit-cli/releases")
-        logging.info("4. Or configure SIP trunk manually in LiveKit Cloud dashboard")
+    try:
+        trunk = await livekit_api.sip.create_sip_inbound_trunk(request)
+    except (api.TwirpError, aiohttp.ClientError) as e:
+        logging.error("Error creating inbound trunk: %s", e)
         return None
 
-def create_dispatch_rule(trunk_sid):
-    dispatch_rule_data = {
-        "name": "Inbound Dispatch Rule",
-        "trunk_ids": [trunk_sid],
-        "rule": {
-            "dispatchRuleIndividual": {
-                "roomPrefix": "call-"
-            }
-        }
-    }
-    with open('dispatch_rule.json', 'w') as f:
-        json.dump(dispatch_rule_data, f, indent=4)
-
-    result = subprocess.run(
-        ['lk', 'sip', 'dispatch-rule', 'create', 'dispatch_rule.json'],
-        capture_output=True,
-        text=True
+    logging.info("Created inbound trunk with SID: %s", trunk.sip_trunk_id)
+    return trunk.sip_trunk_id
+
+async def create_dispatch_rule(livekit_api, trunk_sid):
+    request = api.CreateSIPDispatchRuleRequest(
+        name="Inbound Dispatch Rule",
+        trunk_ids=[trunk_sid],
+        rule=api.SIPDispatchRule(
+            dispatch_rule_individual=api.SIPDispatchRuleIndividual(
+                room_prefix="call-",
+            )
+        ),
     )
 
-    if result.returncode != 0:
-        logging.error(f"Error executing command: {result.stderr}")
+    try:
+        dispatch_rule = await livekit_api.sip.create_sip_dispatch_rule(request)
+    except (api.TwirpError, aiohttp.ClientError) as e:
+        logging.error("Error creating dispatch rule: %s", e)
         return
 
-    logging.info(f"Dispatch rule created: {result.stdout}")
+    logging.info("Dispatch rule created: %s", dispatch_rule.sip_dispatch_rule_id)
 
-def main():
+async def main():
     load_dotenv()
     logging.basicConfig(level=logging.INFO)
 
@@ -164,24 +189,32 @@ def main():
     phone_number = get_env_var("PHONE_NUMBER")
     sip_uri = get_env_var("LIVEKIT_SIP_URI")
 
-    client = Client(account_sid, auth_token)
+    client = get_twilio_client(account_sid, auth_token)
 
     # Choose one of the following options:
     
     # Option 1: Use existing trunk and update if needed (RECOMMENDED)
-    livekit_trunk = get_or_update_livekit_trunk(client, sip_uri)
+    livekit_trunk = await get_or_update_livekit_trunk(client, sip_uri)
     
     # Option 2: Delete all trunks and create new one (CAUTION: This will delete ALL your trunks)
     # Uncomment the line below and comment out the line above if you want to use this option
-    # livekit_trunk = delete_all_trunks_and_create_new(client, sip_uri)
+    # livekit_trunk = await delete_all_trunks_and_create_new(client, sip_uri)
 
-    # Continue with inbound trunk creation
-    inbound_trunk_sid = create_inbound_trunk(phone_number)
-    if inbound_trunk_sid:
-        create_dispatch_rule(inbound_trunk_sid)
+    # Continue with inbound trunk creation, sharing one LiveKit API session
+    livekit_api = api.LiveKitAPI(
+        get_env_var("LIVEKIT_URL"),
+        get_env_var("LIVEKIT_API_KEY"),
+        get_env_var("LIVEKIT_API_SECRET"),
+    )
+    try:
+        inbound_trunk_sid = await create_inbound_trunk(livekit_api, phone_number)
+        if inbound_trunk_sid:
+            await create_dispatch_rule(livekit_api, inbound_trunk_sid)
+    finally:
+        await livekit_api.aclose()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
 
 
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from livekit import api
 import os 
 import logging
@@ -14,6 +15,21 @@ from src.utils.logger import get_logger, setup_root_logger
 setup_root_logger("DEBUG")
 logger = get_logger(__name__)
 
+# Characters stripped from phone numbers when building room names
+_PHONE_STRIP = str.maketrans('', '', '+-')
+
+# Shared LiveKit API client, kept open across calls and closed on shutdown
+_SHARED_LKAPI = None
+
+
+async def close_shared_api():
+    """Close the shared LiveKit API client if it was created"""
+    global _SHARED_LKAPI
+    if _SHARED_LKAPI is not None:
+        await _SHARED_LKAPI.aclose()
+        _SHARED_LKAPI = None
+
+
 class TelephonyManager:
     """Manage telephony operations with LiveKit"""
     
@@ -24,32 +40,36 @@ class TelephonyManager:
     def setup_api(self):
         """Setup LiveKit API client"""
         """Create a dispatch and add a SIP participant to call the phone number"""
-        self.lkapi = api.LiveKitAPI()
+        global _SHARED_LKAPI
+        if _SHARED_LKAPI is None:
+            _SHARED_LKAPI = api.LiveKitAPI()
+        self.lkapi = _SHARED_LKAPI
         self.outbound_trunk_id = "ST_BGckDMqrXEe2"
     
     async def make_call(self, phone_number):
-        room_name = f"call-{phone_number.replace('+', '').replace('-', '')}-{int(asyncio.get_event_loop().time())}"
+        room_name = f"call-{phone_number.translate(_PHONE_STRIP)}-{time.monotonic_ns() // 1_000_000_000}"
         agent_name = "asset_management_agent"
         
-        # Create agent dispatch
-        logger.info(f"Creating dispatch for agent {agent_name} in room {room_name}")
-        dispatch = await self.lkapi.agent_dispatch.create_dispatch(
-            api.CreateAgentDispatchRequest(
-                agent_name=agent_name, room=room_name, metadata=phone_number
-            )
-        )
-        logger.info(f"Created dispatch: {dispatch}")
-        
-        # Create SIP participant to make the call
+        # Validate the trunk before dispatching, since both requests go out together
         if not self.outbound_trunk_id or not self.outbound_trunk_id.startswith("ST_"):
             logger.error("SIP_OUTBOUND_TRUNK_ID is not set or invalid")
             return
         
-        logger.info(f"Dialing {phone_number} to room {room_name}")
+        # Create agent dispatch
+        logger.info("Creating dispatch for agent %s in room %s", agent_name, room_name)
+        dispatch_task = asyncio.create_task(
+            self.lkapi.agent_dispatch.create_dispatch(
+                api.CreateAgentDispatchRequest(
+                    agent_name=agent_name, room=room_name, metadata=phone_number
+                )
+            )
+        )
         
-        try:
-            # Create SIP participant to initiate the call
-            sip_participant = await self.lkapi.sip.create_sip_participant(
+        # Create SIP participant to initiate the call; the dispatch is keyed by
+        # room name, so it does not need to complete first
+        logger.info("Dialing %s to room %s", phone_number, room_name)
+        sip_task = asyncio.create_task(
+            self.lkapi.sip.create_sip_participant(
                 api.CreateSIPParticipantRequest(
                     room_name=room_name,
                     sip_trunk_id=self.outbound_trunk_id,
@@ -57,12 +77,26 @@ class TelephonyManager:
                     participant_identity="phone_user",
                 )
             )
-            logger.info(f"Created SIP participant: {sip_participant}")
-        except Exception as e:
-            logger.error(f"Error creating SIP participant: {e}")
+        )
         
-        # Close API connection
-        await self.lkapi.aclose()
+        dispatch, sip_participant = await asyncio.gather(
+            dispatch_task, sip_task, return_exceptions=True
+        )
+        if isinstance(sip_participant, BaseException):
+            logger.error("Error creating SIP participant: %s", sip_participant)
+        else:
+            logger.info("Created SIP participant: %s", sip_participant)
+        
+        if isinstance(dispatch, BaseException):
+            # No agent will join, so hang up rather than leave the callee on dead air
+            if not isinstance(sip_participant, BaseException):
+                logger.error("Dispatch failed, tearing down room %s", room_name)
+                try:
+                    await self.lkapi.room.delete_room(api.DeleteRoomRequest(room=room_name))
+                except Exception as e:
+                    logger.error("Error deleting room %s: %s", room_name, e)
+            raise dispatch
+        logger.info("Created dispatch: %s", dispatch)
 
 
 
@@ -76,17 +110,25 @@ async def make_outbound_call():
     
     try:
         room_name = await telephony.make_call(phone_number)
-        logger.info(f"Outbound call initiated to {phone_number} in room {room_name}")
+        logger.info("Outbound call initiated to %s in room %s", phone_number, room_name)
         
         # The agent will automatically handle the call when someone joins the room
         return room_name
         
     except Exception as e:
-        logger.error(f"Failed to make outbound call: {e}")
+        logger.error("Failed to make outbound call: %s", e)
+
+
+async def main():
+    try:
+        await make_outbound_call()
+    finally:
+        # Close API connection on shutdown
+        await close_shared_api()
 
 
 
 if __name__ == "__main__":
     
     # For outbound calls, you can use:
-    asyncio.run(make_outbound_call())
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1,54 +1,66 @@
 import os
 import csv
+import asyncio
 import time
 from datetime import datetime
 from dotenv import load_dotenv
 import logging
 
+from src.utils.timestamps import resolve_timestamps
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
+os.makedirs("logs", exist_ok=True)
+
 
 class CSVLogger:
     def __init__(self):
         self.logs = []
         self.log_file = os.path.join("logs", f"log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-        os.makedirs("logs", exist_ok=True)
         
     def log_component(self, component: str, duration: float):
-        self.logs.append({
-            "timestamp": datetime.now().isoformat(),
-            "component": component,
-            "duration_seconds": round(duration, 3)
-        })
+        # Keep the raw monotonic tick; timestamps are formatted in save()
+        self.logs.append((time.monotonic_ns(), component, duration))
         
     def save(self):
-        with open(self.log_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=["timestamp", "component", "duration_seconds"])
-            writer.writeheader()
-            writer.writerows(self.logs)
+        rows = resolve_timestamps(self.logs, value_format=lambda duration: round(duration, 3))
+        with open(self.log_file, 'w', newline='', buffering=65536) as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "component", "duration_seconds"])
+            writer.writerows(rows)
         return self.log_file
 
 
 from livekit.plugins import cartesia, deepgram, openai, silero, noise_cancellation, elevenlabs, assemblyai
 from livekit import agents
-from livekit.agents import AgentSession, Agent, RoomInputOptions
+from livekit.agents import AgentSession, Agent, RoomInputOptions, JobProcess
 
-from src.agent.livekit_agents import Assistant
+from src.agent.livekit_agents import Assistant, start_metrics_flusher
 
 load_dotenv()
 
 
-# Set environment variables for LiveKit
-os.environ["LIVEKIT_API_KEY"]
-os.environ["LIVEKIT_API_SECRET"]
-os.environ["LIVEKIT_URL"]
+REQUIRED_ENV_VARS = ("LIVEKIT_API_KEY", "LIVEKIT_API_SECRET", "LIVEKIT_URL")
+
+
+def validate_env():
+    """Fail fast if the LiveKit credentials are missing"""
+    missing = [var for var in REQUIRED_ENV_VARS if var not in os.environ]
+    if missing:
+        raise RuntimeError(f"Missing environment variables: {', '.join(missing)}")
 
 
+def prewarm(proc: JobProcess):
+    # Load model weights once per worker process instead of once per call
+    proc.userdata["vad"] = silero.VAD.load()
+
 
 async def entrypoint(ctx: agents.JobContext):
+    validate_env()
+    start_metrics_flusher(ctx)
     logger = CSVLogger()
     start_time = time.time()
 
@@ -66,21 +78,20 @@ async def entrypoint(ctx: agents.JobContext):
             ),
 
         ),
-        vad=silero.VAD.load(),
+        vad=ctx.proc.userdata["vad"],
     )
 
-    # Start the session with the Assistant agent
-    await session.start(
-        room=ctx.room,
-        agent=Assistant(),
-        room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVCTelephony(),
+    # Start the session with the Assistant agent while connecting to the room
+    await asyncio.gather(
+        session.start(
+            room=ctx.room,
+            agent=Assistant(),
+            room_input_options=RoomInputOptions(
+                noise_cancellation=noise_cancellation.BVCTelephony(),
+            ),
         ),
+        ctx.connect(),
     )
-
-
-
-    await ctx.connect()
     
     # Time ASR processing
     asr_start = time.time()
@@ -112,29 +123,46 @@ if __name__ == "__main__":
     from fastapi import FastAPI
     from fastapi.responses import FileResponse
 
+    from functools import lru_cache
+
     app = FastAPI()
 
-    @app.get("/download-logs")
-    async def download_logs():
-        latest_log = max(
+    @lru_cache(maxsize=1)
+    def _latest_log(dir_mtime_ns: int):
+        # Keyed by the directory mtime, so only adding or removing a log
+        # invalidates it; an existing CSV rewritten in place (e.g. two
+        # CSVLoggers sharing a name within one second) does not trigger a
+        # rescan, so an older file rewritten later is not picked up
+        return max(
             (os.path.join("logs", f) for f in os.listdir("logs") if f.endswith(".csv")),
             key=os.path.getmtime,
             default=None
         )
+
+    @app.get("/download-logs")
+    async def download_logs():
+        latest_log = _latest_log(os.stat("logs").st_mtime_ns)
         if latest_log:
             return FileResponse(latest_log, filename="logs.csv")
         return {"message": "No logs available"}
 
-    # Run the FastAPI server in a separate thread
+    # Run the FastAPI server in a separate thread; agents.cli.run_app owns the
+    # worker's event loop
     import threading
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        # "auto" would pick uvloop and swap the process-wide loop policy under the worker
+        loop="asyncio",
+    ))
     threading.Thread(
-        target=uvicorn.run,
-        args=(app,),
-        kwargs={"host": "0.0.0.0", "port": 8000},
+        target=server.run,
         daemon=True
     ).start()
 
     # Run the main agent
     agents.cli.run_app(agents.WorkerOptions(
-        entrypoint_fnc=entrypoint
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         ))
@@ -1,12 +1,16 @@
+import asyncio
 import time
 import logging
 import csv
-import datetime
+import atexit
+import contextvars
+import threading
 from typing import Any
 from dataclasses import dataclass
 from livekit.agents import function_tool, Agent, RunContext
-from livekit.agents import get_job_context
+from livekit.agents import get_job_context, JobContext
 from src.prompts.system_prompt import *
+from src.utils.timestamps import resolve_timestamps
 
 @dataclass
 class InventoryItems:
@@ -25,16 +29,95 @@ async def hangup_call():
     )
 
 # --- Timing & Logging Utilities ---
+# Metrics file is opened once per process so rows are written without
+# reopening the file
+_METRICS_FH = open("metrics_log.csv", "a", newline="")
+_METRICS_WRITER = csv.writer(_METRICS_FH)
+
+# Pending (monotonic_ns, label, value) rows for the current session. Each
+# session runs its own queue and flusher, started by start_metrics_flusher();
+# the flusher writes batches from a worker thread. Wall-clock timestamps are
+# only resolved when the rows are written.
+_METRICS_QUEUE = contextvars.ContextVar("metrics_queue", default=None)
+_METRICS_FLUSH_INTERVAL = 0.05
+_METRICS_LOCK = threading.Lock()
+# Queued by the shutdown callback; the flusher writes its last batch and exits
+_METRICS_STOP = object()
+
 def log_duration(label: str, start: float, end: float):
     duration = end - start
-    logging.info(f"[Timing] {label}: {duration:.2f}s")
+    logging.info("[Timing] %s: %.2fs", label, duration)
     save_metrics_to_csv(label, duration)
     return duration
 
 def save_metrics_to_csv(label: str, value: float):
-    with open("metrics_log.csv", "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([datetime.datetime.now().isoformat(), label, f"{value:.2f}"])
+    row = (time.monotonic_ns(), label, value)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Plain sync caller; nothing to block
+        _write_metrics([row])
+        return
+
+    queue = _METRICS_QUEUE.get()
+    if queue is not None:
+        queue.put_nowait(row)
+    else:
+        # No session flusher on this loop; keep the write off it anyway
+        loop.run_in_executor(None, _write_metrics, [row]).add_done_callback(_log_write_error)
+
+def start_metrics_flusher(ctx: JobContext):
+    """Start this session's metrics flusher; it is drained on job shutdown"""
+    queue = asyncio.Queue()
+    _METRICS_QUEUE.set(queue)
+    task = asyncio.create_task(_metrics_flusher(queue))
+
+    async def _stop_metrics_flusher():
+        # Let the flusher finish its in-flight batch rather than cancelling it
+        queue.put_nowait(_METRICS_STOP)
+        await task
+        # Rows queued while the last batch was being written
+        rows = _drain(queue)
+        if rows:
+            await asyncio.to_thread(_write_metrics, rows)
+
+    ctx.add_shutdown_callback(_stop_metrics_flusher)
+
+async def _metrics_flusher(queue: asyncio.Queue):
+    while True:
+        rows = [await queue.get()]
+        rows.extend(_drain(queue))
+        stopping = any(row is _METRICS_STOP for row in rows)
+        rows = [row for row in rows if row is not _METRICS_STOP]
+        if rows:
+            try:
+                await asyncio.to_thread(_write_metrics, rows)
+            except OSError:
+                logging.exception("[Metrics] Failed to write %d rows", len(rows))
+        if stopping:
+            return
+        await asyncio.sleep(_METRICS_FLUSH_INTERVAL)
+
+def _drain(queue: asyncio.Queue):
+    rows = []
+    while not queue.empty():
+        rows.append(queue.get_nowait())
+    return rows
+
+def _log_write_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.error("[Metrics] Failed to write row: %s", future.exception())
+
+def _write_metrics(rows):
+    with _METRICS_LOCK:
+        _METRICS_WRITER.writerows(resolve_timestamps(rows, value_format="{:.2f}".format))
+        _METRICS_FH.flush()
+
+def _close_metrics():
+    with _METRICS_LOCK:
+        _METRICS_FH.close()
+
+atexit.register(_close_metrics)
 
 # --- Main Assistant Agent ---
 class Assistant(Agent):
@@ -0,0 +1,24 @@
+"""Timestamp utilities."""
+
+import datetime
+import time
+
+
+def resolve_timestamps(rows, value_format=None, now_ns=None, now=None):
+    """Turn (monotonic_ns, label, value) rows into [isoformat timestamp, label, value].
+
+    Wall-clock time is read once and each row is placed relative to it, so
+    recording an event only needs time.monotonic_ns().
+    """
+    if now_ns is None:
+        now_ns = time.monotonic_ns()
+    if now is None:
+        now = datetime.datetime.now()
+    return [
+        [
+            (now - datetime.timedelta(microseconds=(now_ns - t_ns) / 1000)).isoformat(),
+            label,
+            value_format(value) if value_format else value,
+        ]
+        for t_ns, label, value in rows
+    ]
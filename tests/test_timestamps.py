@@ -0,0 +1,54 @@
+"""Tests for metric timestamp resolution."""
+
+import csv
+import datetime
+import io
+
+from src.utils.timestamps import resolve_timestamps
+
+NOW = datetime.datetime(2024, 1, 1, 12, 0, 0)
+NOW_NS = 10_000_000_000
+
+
+class TestResolveTimestamps:
+    """Test cases for resolve_timestamps."""
+
+    def test_rows_placed_relative_to_now(self):
+        """Test each row is offset from wall-clock now by its monotonic age."""
+        rows = resolve_timestamps(
+            [(NOW_NS - 2_500_000_000, "ASR", 0.1), (NOW_NS, "TOTAL", 0.2)],
+            now_ns=NOW_NS,
+            now=NOW,
+        )
+        assert rows == [
+            ["2024-01-01T11:59:57.500000", "ASR", 0.1],
+            ["2024-01-01T12:00:00", "TOTAL", 0.2],
+        ]
+
+    def test_order_and_monotonic_timestamps_preserved(self):
+        """Test rows keep their order and timestamps never go backwards."""
+        ticks = [NOW_NS - 3_000_000_000, NOW_NS - 1_000_000, NOW_NS - 1_000, NOW_NS]
+        rows = resolve_timestamps(
+            [(t, f"row{i}", i) for i, t in enumerate(ticks)], now_ns=NOW_NS, now=NOW
+        )
+        assert [row[1] for row in rows] == ["row0", "row1", "row2", "row3"]
+        timestamps = [datetime.datetime.fromisoformat(row[0]) for row in rows]
+        assert timestamps == sorted(timestamps)
+
+    def test_value_format_applied_in_csv(self):
+        """Test the value formatters used by the agent and CSVLogger."""
+        raw = [(NOW_NS, "LLM", 1.23456)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerows(resolve_timestamps(raw, value_format="{:.2f}".format, now_ns=NOW_NS, now=NOW))
+        writer.writerows(
+            resolve_timestamps(raw, value_format=lambda d: round(d, 3), now_ns=NOW_NS, now=NOW)
+        )
+        assert buffer.getvalue() == (
+            "2024-01-01T12:00:00,LLM,1.23\n"
+            "2024-01-01T12:00:00,LLM,1.235\n"
+        )
+
+    def test_empty_rows(self):
+        """Test no rows in means no rows out."""
+        assert resolve_timestamps([]) == []